@@ -1,13 +1,41 @@
-from flask import Flask, request, jsonify
+# Patch blocking sockets before anything else imports them, so gevent workers
+# can serve other requests while one waits on Groq, ElevenLabs or Supabase
+from gevent import monkey
+monkey.patch_all()
+
+from flask import Flask, request, jsonify, send_from_directory, url_for
+from flask.json.provider import JSONProvider
 import os
-import json
-import requests
+import orjson
+import re
+import httpx
+import socket
 import base64
+import hashlib
 from dotenv import load_dotenv
 import logging
 import time
+import threading
+import queue
+import atexit
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+from cachetools import LRUCache, TTLCache
 from supabase import create_client, Client
 
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+try:
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+
 # Load environment variables
 load_dotenv()
 
@@ -15,32 +43,479 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class ORJSONProvider(JSONProvider):
+    """
+    Flask JSON provider that uses orjson for jsonify and request.json
+    """
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 # API keys from environment variables
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+SUPABASE_POOLER_URL = os.getenv("SUPABASE_POOLER_URL")
 
 # Initialize Supabase client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Direct Postgres connections through the Supavisor transaction pooler (port 6543)
+# for the hot database paths. Prepared statements are disabled because transaction
+# mode does not keep them between transactions. Waits for a connection are kept
+# short so a misconfigured or unreachable pooler falls back to PostgREST quickly
+POOLER_TIMEOUT = 2
+_pool = None
+if SUPABASE_POOLER_URL and ConnectionPool is not None:
+    _pool = ConnectionPool(
+        conninfo=SUPABASE_POOLER_URL,
+        min_size=2,
+        max_size=20,
+        timeout=POOLER_TIMEOUT,
+        kwargs={"prepare_threshold": None, "connect_timeout": POOLER_TIMEOUT},
+        open=True
+    )
+
 # API endpoints
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1/text-to-speech"
 
+# Local directory for generated audio, next to this file so writes and serve_audio
+# agree whatever directory the server is started from
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio_files")
+os.makedirs(AUDIO_DIR, exist_ok=True)
+
+# Status codes worth retrying, and how many extra attempts to make
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 2
+
+# Shared HTTP/2 client: connections to Groq and ElevenLabs stay warm across requests
+_http = httpx.Client(
+    timeout=httpx.Timeout(30.0, connect=2.0),
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=MAX_RETRIES,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+    )
+)
+
+def post_with_retry(url, **kwargs):
+    """
+    POST through the shared client, retrying transient status codes with backoff
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        response = _http.post(url, **kwargs)
+        if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+            return response
+        time.sleep(0.2 * (2 ** attempt))
+
+def warm_up_dns():
+    """
+    Resolve the API hosts ahead of the first request so it does not pay for DNS
+    """
+    for host in ("api.groq.com", "api.elevenlabs.io"):
+        try:
+            socket.getaddrinfo(host, 443)
+        except OSError as e:
+            logger.warning(f"Could not resolve {host}: {e}")
+
+# Under gevent the pool threads are greenlets, so both pools are sized to the
+# connections a worker serves at once rather than capping it at a few slots
+WORKER_CONNECTIONS = int(os.environ.get("WORKER_CONNECTIONS", 1000))
+
+# Worker pool for running independent API calls alongside each other
+_executor = ThreadPoolExecutor(max_workers=WORKER_CONNECTIONS)
+_executor.submit(warm_up_dns)
+
+# Pool for persisting audio and cache entries off the request path
+_io_pool = ThreadPoolExecutor(max_workers=WORKER_CONNECTIONS)
+
+# Semantic cache for Groq results (in-process LRU in front of the groq_cache table)
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_SIZE = 512
+# Cached answers go stale as listings change, so they expire like the response cache
+SEMANTIC_CACHE_TTL = 24 * 60 * 60
+
+_embedding_model = None
+_embedding_model_lock = threading.Lock()
+_semantic_cache = OrderedDict()
+_semantic_cache_lock = threading.Lock()
+
+def get_embedding_model():
+    """
+    Load the sentence embedding model once and reuse it across requests
+    """
+    global _embedding_model
+    if SentenceTransformer is None:
+        return None
+
+    with _embedding_model_lock:
+        if _embedding_model is None:
+            logger.info(f"Loading embedding model: {EMBEDDING_MODEL_NAME}")
+            _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _embedding_model
+
+def embed_query(user_query):
+    """
+    Compute a normalized sentence embedding for the user query, or None if unavailable
+    """
+    model = get_embedding_model()
+    if model is None:
+        return None
+
+    try:
+        return model.encode(user_query, normalize_embeddings=True)
+    except Exception as e:
+        logger.error(f"Error computing query embedding: {e}")
+        return None
+
+def lookup_semantic_cache(embedding):
+    """
+    Return a cached Groq result for a semantically similar query, checking the
+    in-process cache first and then the groq_cache table in Supabase
+    """
+    key = np.round(embedding, 4).tobytes()
+    now = time.time()
+
+    with _semantic_cache_lock:
+        expired = [cached_key for cached_key, (_, _, created_at) in _semantic_cache.items()
+                   if now - created_at >= SEMANTIC_CACHE_TTL]
+        for cached_key in expired:
+            del _semantic_cache[cached_key]
+
+        if key in _semantic_cache:
+            _semantic_cache.move_to_end(key)
+            return _semantic_cache[key][1]
+
+        # Embeddings are normalized, so the dot product is the cosine similarity
+        best_key, best_score = None, SEMANTIC_CACHE_THRESHOLD
+        for cached_key, (cached_embedding, _, _) in _semantic_cache.items():
+            score = float(np.dot(embedding, cached_embedding))
+            if score >= best_score:
+                best_key, best_score = cached_key, score
+
+        if best_key is not None:
+            _semantic_cache.move_to_end(best_key)
+            return _semantic_cache[best_key][1]
+
+    if not supabase:
+        return None
+
+    try:
+        response = supabase.rpc('match_cache', {
+            "query_embedding": embedding.tolist(),
+            "match_threshold": SEMANTIC_CACHE_THRESHOLD,
+            "match_count": 1,
+            "max_age_seconds": SEMANTIC_CACHE_TTL
+        }).execute()
+
+        if response.data:
+            row = response.data[0]
+            result = {
+                "recommendation_data": row["recommendation_data"],
+                "explanation_text": row["explanation_text"]
+            }
+            _remember_semantic_result(key, embedding, result, float(row["created_at"]))
+            return result
+    except Exception as e:
+        logger.error(f"Error querying semantic cache in Supabase: {e}")
+
+    return None
+
+def _remember_semantic_result(key, embedding, result, created_at):
+    """
+    Add a result to the in-process semantic cache, evicting the least recently used entry
+    """
+    with _semantic_cache_lock:
+        _semantic_cache[key] = (embedding, result, created_at)
+        _semantic_cache.move_to_end(key)
+        while len(_semantic_cache) > SEMANTIC_CACHE_SIZE:
+            _semantic_cache.popitem(last=False)
+
+def store_semantic_cache(embedding, result):
+    """
+    Store a Groq result in the in-process cache, and in the groq_cache table in the background
+    """
+    _remember_semantic_result(np.round(embedding, 4).tobytes(), embedding, result, time.time())
+
+    if supabase:
+        _io_pool.submit(insert_semantic_cache, embedding, result)
+
+def insert_semantic_cache(embedding, result):
+    """
+    Write a Groq result to the groq_cache table
+    """
+    try:
+        supabase.table('groq_cache').insert({
+            "embedding": embedding.tolist(),
+            "recommendation_data": result["recommendation_data"],
+            "explanation_text": result["explanation_text"]
+        }).execute()
+    except Exception as e:
+        logger.error(f"Error storing result in semantic cache: {e}")
+
+# Exact-match cache for /recommend responses. Only the text fields and the audio
+# location are kept; the clip itself is rebuilt from the audio cache on a hit
+RESPONSE_CACHE_TTL = 24 * 60 * 60
+_response_cache = TTLCache(maxsize=1024, ttl=60 * 60)
+_response_cache_lock = threading.Lock()
+
+def response_cache_key(user_query):
+    """
+    Hash the normalized user query into a key for the response cache
+    """
+    return hashlib.sha256(user_query.lower().strip().encode()).hexdigest()
+
+def lookup_response_cache(query_hash):
+    """
+    Return a previously served response for the same query, checking the
+    in-process cache first and then the responses_cache table in Supabase
+    """
+    with _response_cache_lock:
+        cached_response = _response_cache.get(query_hash)
+    if cached_response is not None:
+        return cached_response
+
+    if not supabase:
+        return None
+
+    try:
+        result = supabase.table('responses_cache').select('*').eq('query_hash', query_hash).limit(1).execute()
+        if result.data:
+            row = result.data[0]
+            if time.time() - float(row["created_at"]) < RESPONSE_CACHE_TTL:
+                with _response_cache_lock:
+                    _response_cache[query_hash] = row["response"]
+                return row["response"]
+    except Exception as e:
+        logger.error(f"Error reading response cache from Supabase: {e}")
+
+    return None
+
+def response_cache_entry(response):
+    """
+    Return what the response cache keeps for a served response: everything but the base64 audio
+    """
+    return {key: value for key, value in response.items() if key != "audio_response"}
+
+def store_response_cache(query_hash, response):
+    """
+    Store a served response (without its base64 audio) in the in-process cache,
+    and in the responses_cache table in the background
+    """
+    response = response_cache_entry(response)
+    with _response_cache_lock:
+        _response_cache[query_hash] = response
+
+    if supabase:
+        _io_pool.submit(upsert_response_cache, query_hash, response)
+
+def upsert_response_cache(query_hash, response):
+    """
+    Write a response cache entry to the responses_cache table
+    """
+    try:
+        supabase.table('responses_cache').upsert({
+            "query_hash": query_hash,
+            "response": response,
+            "created_at": str(time.time())
+        }, on_conflict='query_hash').execute()
+    except Exception as e:
+        logger.error(f"Error storing response cache in Supabase: {e}")
+
+# In-process cache of the houses table, refreshed after HOUSES_CACHE_TTL seconds
+HOUSES_CACHE_TTL = 300
+_houses_cache = {"data": None, "json": None, "ts": 0}
+_houses_cache_lock = threading.Lock()
+
 def load_housing_data():
     """
-    Load housing data from Supabase
+    Load housing data from Supabase, served from the in-process cache while fresh
+    """
+    return _get_cached_houses()[0]
+
+def load_housing_json():
+    """
+    Return the cached housing data, trimmed to prompt fields and pre-serialized as JSON
+    """
+    return _get_cached_houses()[1]
+
+def invalidate_housing_cache():
+    """
+    Force the next load_housing_data call to re-read the houses table
     """
+    with _houses_cache_lock:
+        _houses_cache["ts"] = 0
+
+def _get_cached_houses():
+    """
+    Return (houses, houses_json), re-reading Supabase once the cache has expired
+    """
+    with _houses_cache_lock:
+        if _houses_cache["data"] is not None and time.time() - _houses_cache["ts"] < HOUSES_CACHE_TTL:
+            return _houses_cache["data"], _houses_cache["json"]
+        
+        try:
+            response = supabase.table('houses').select('*').execute()
+            # Drop the embedding column so no path hands the vectors on to clients or caches
+            _houses_cache["data"] = [public_house(house) for house in response.data]
+            _houses_cache["json"] = orjson.dumps(prompt_houses(_houses_cache["data"])).decode()
+            _houses_cache["ts"] = time.time()
+            return _houses_cache["data"], _houses_cache["json"]
+        except Exception as e:
+            logger.error(f"Error loading houses from Supabase: {e}")
+            # Keep serving the last good data if we have it
+            if _houses_cache["data"] is not None:
+                return _houses_cache["data"], _houses_cache["json"]
+            # Fall back to local data if database is unavailable
+            return DUMMY_HOUSING_DATA, orjson.dumps(prompt_houses(DUMMY_HOUSING_DATA)).decode()
+
+# Only the K closest houses (and only the fields the model reasons over) go into the prompt
+HOUSE_CANDIDATES = 5
+PROMPT_HOUSE_FIELDS = (
+    "id", "city", "street_address", "rent", "lease_duration", "availability_date",
+    "furnished", "utilities_included", "wifi_available", "no_of_bedrooms",
+    "no_of_bathrooms", "house_type", "distance_to_college", "transportation_options",
+    "contact_details"
+)
+
+_house_embeddings = {}
+_house_embeddings_lock = threading.Lock()
+_house_backfill_lock = threading.Lock()
+
+def house_embedding_text(house):
+    """
+    Build the text a house is embedded from for candidate ranking
+    """
+    return f"{house.get('house_type')} {house.get('city')} ${house.get('rent')} {house.get('distance_to_college')} {house.get('lease_duration')}"
+
+def prompt_houses(houses):
+    """
+    Strip houses down to the fields the model needs (no image URLs or embeddings)
+    """
+    return [{field: house[field] for field in PROMPT_HOUSE_FIELDS if field in house} for house in houses]
+
+def public_house(house):
+    """
+    Return a house row without its embedding column
+    """
+    return {field: value for field, value in house.items() if field != "embedding"}
+
+def select_candidate_houses(query_embedding, limit=HOUSE_CANDIDATES):
+    """
+    Return the houses closest to the query embedding, using the match_houses RPC
+    and falling back to ranking the cached houses in-process
+    """
+    candidates = match_houses_in_db(query_embedding, limit)
+    if candidates:
+        # match_houses also returns houses listed since the last backfill; embed them
+        # in the background so they are ranked from now on
+        if any(house.get("embedding") is None for house in candidates):
+            _io_pool.submit(backfill_house_embeddings)
+        return [public_house(house) for house in candidates]
+
+    houses = load_housing_data()
+    model = get_embedding_model()
+    if model is None or len(houses) <= limit:
+        return houses
+
+    try:
+        texts = [house_embedding_text(house) for house in houses]
+        with _house_embeddings_lock:
+            missing = [text for text in texts if text not in _house_embeddings]
+            if missing:
+                for text, embedding in zip(missing, model.encode(missing, normalize_embeddings=True)):
+                    _house_embeddings[text] = embedding
+            house_matrix = np.stack([_house_embeddings[text] for text in texts])
+
+        scores = house_matrix @ query_embedding
+        top = np.argsort(-scores)[:limit]
+        return [houses[i] for i in top]
+    except Exception as e:
+        logger.error(f"Error ranking houses locally: {e}")
+        return houses
+
+def match_houses_in_db(query_embedding, limit):
+    """
+    Fetch the houses nearest to the query embedding from the houses.embedding column
+    """
+    if _pool is not None:
+        try:
+            vector = "[" + ",".join(f"{value:.6f}" for value in query_embedding) + "]"
+            with _pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+                cur.execute("select * from match_houses(%s::vector, %s)", (vector, limit))
+                return cur.fetchall()
+        except Exception as e:
+            logger.error(f"Error matching houses through the pooler: {e}")
+
     try:
-        response = supabase.table('houses').select('*').execute()
+        response = supabase.rpc('match_houses', {
+            "query_embedding": query_embedding.tolist(),
+            "match_count": limit
+        }).execute()
         return response.data
     except Exception as e:
-        logger.error(f"Error loading houses from Supabase: {e}")
-        # Fall back to local data if database is unavailable
-        return DUMMY_HOUSING_DATA
+        logger.error(f"Error matching houses in Supabase: {e}")
+        return None
+
+def backfill_house_embeddings():
+    """
+    Compute embeddings for houses that do not have one yet. Runs at startup and
+    whenever match_houses returns un-embedded houses; concurrent calls are skipped
+    """
+    model = get_embedding_model()
+    if model is None:
+        logger.warning("Embedding model not available. Skipping house embedding backfill.")
+        return
+
+    if not _house_backfill_lock.acquire(blocking=False):
+        return
+    try:
+        response = supabase.table('houses').select('*').is_('embedding', 'null').execute()
+        if not response.data:
+            return
+
+        logger.info(f"Computing embeddings for {len(response.data)} houses")
+        texts = [house_embedding_text(house) for house in response.data]
+        embeddings = model.encode(texts, normalize_embeddings=True)
+        for house, embedding in zip(response.data, embeddings):
+            supabase.table('houses').update({"embedding": embedding.tolist()}).eq('id', house["id"]).execute()
+    except Exception as e:
+        logger.error(f"Error backfilling house embeddings: {e}")
+    finally:
+        _house_backfill_lock.release()
+
+def attach_house_details(recommendation_data, candidates):
+    """
+    Expand matched house ids into full rows and reinject the recommendation's images
+    """
+    houses_by_id = {house.get("id"): house for house in candidates}
+    
+    # The model may answer "no match" with null (or something other than a list)
+    matches = recommendation_data.get("matches") or []
+    if not isinstance(matches, list):
+        matches = []
+    recommendation_data["matches"] = [
+        houses_by_id.get(match.get("id") if isinstance(match, dict) else match, match)
+        for match in matches
+    ]
+    
+    recommendation = recommendation_data.get("recommendation")
+    if isinstance(recommendation, dict):
+        title = recommendation.get("title")
+        for house in candidates:
+            if house.get("street_address") == title:
+                recommendation["images"] = house.get("image_urls", [])
+                break
+    
+    return recommendation_data
 
 # Initialize Supabase tables and seed data if needed
 def initialize_database():
@@ -48,14 +523,18 @@ def initialize_database():
     Initialize database with dummy data if tables are empty
     """
     try:
-        # Check if houses table has data
-        houses_response = supabase.table('houses').select('count').execute()
-        house_count = houses_response.count if hasattr(houses_response, 'count') else len(houses_response.data)
+        # Check if houses table has data (HEAD request: only the count comes back, no rows)
+        houses_response = supabase.table('houses').select('id', count='exact', head=True).execute()
+        house_count = houses_response.count or 0
         
         if house_count == 0:
             logger.info("Seeding houses table with dummy data")
-            for house in DUMMY_HOUSING_DATA:
-                supabase.table('houses').insert(house).execute()
+            # One multi-row insert; rows that already exist are left alone
+            supabase.table('houses').upsert(DUMMY_HOUSING_DATA, on_conflict='id', ignore_duplicates=True).execute()
+            invalidate_housing_cache()
+        
+        # Embeddings back the match_houses RPC used to pick prompt candidates
+        backfill_house_embeddings()
             
         # Ensure responses table exists (will not fail if already exists)
         logger.info("Database initialization completed")
@@ -63,146 +542,318 @@ def initialize_database():
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
 
-def query_groq(sentences):
+# Prompt, headers and payload settings for Groq, built once at import
+_SYSTEM_PROMPT = """
+You are a housing recommendation assistant for college students looking for housing near Stevens Institute of Technology in Hoboken, NJ. 
+
+Based on the user's query, analyze their preferences and return suitable housing options from our database.
+
+Respond with a single valid JSON object ONLY, with this structure (keep "explanation" as the first field):
+{
+    "explanation": "a short paragraph about why you made this recommendation, mentioning the proximity to Stevens and any other relevant factors",
+    "matches": [list of the ids of matching properties],
+    "recommendation": {
+        "title": "street_address",
+        "Cost": "rent as string with $ sign",
+        "Room": "house_type or no_of_bedrooms info",
+        "Lease": "lease_duration",
+        "ownerPhone": "contact_details"
+    }
+}
+"""
+
+_GROQ_HEADERS = {
+    "Authorization": f"Bearer {GROQ_API_KEY}",
+    "Content-Type": "application/json"
+}
+
+# Worked examples that pin the output format for the small model
+_FEW_SHOT_MESSAGES = [
+    {"role": "user", "content": 'User query: I want a furnished place under $2000 close to campus\n\nHousing database: [{"id":"x1","city":"Hoboken","street_address":"10 Example St","rent":1800,"lease_duration":"12 months","furnished":true,"no_of_bedrooms":1,"house_type":"Apartment","distance_to_college":"0.3 miles","contact_details":"15550000001"},{"id":"x2","city":"Jersey City","street_address":"20 Sample Ave","rent":2400,"lease_duration":"9 months","furnished":false,"no_of_bedrooms":1,"house_type":"Condo","distance_to_college":"1.5 miles","contact_details":"15550000002"}]'},
+    {"role": "assistant", "content": '{"explanation": "10 Example St is furnished, costs $1800 a month and is only 0.3 miles from Stevens, so it fits your budget and keeps you close to campus.", "matches": ["x1"], "recommendation": {"title": "10 Example St", "Cost": "$1800", "Room": "Apartment, 1 bedroom", "Lease": "12 months", "ownerPhone": "15550000001"}}'},
+    {"role": "user", "content": 'User query: Two bedrooms for me and a roommate, short lease is fine\n\nHousing database: [{"id":"y1","city":"Hoboken","street_address":"5 Demo Pl","rent":2600,"lease_duration":"6 months","furnished":true,"no_of_bedrooms":2,"house_type":"Apartment","distance_to_college":"0.5 miles","contact_details":"15550000003"},{"id":"y2","city":"Hoboken","street_address":"7 Test Rd","rent":1700,"lease_duration":"12 months","furnished":false,"no_of_bedrooms":1,"house_type":"Studio","distance_to_college":"0.2 miles","contact_details":"15550000004"}]'},
+    {"role": "assistant", "content": '{"explanation": "5 Demo Pl has the two bedrooms you need, a 6 month lease and is half a mile from Stevens, which makes it an easy walk to class for both of you.", "matches": ["y1"], "recommendation": {"title": "5 Demo Pl", "Cost": "$2600", "Room": "Apartment, 2 bedrooms", "Lease": "6 months", "ownerPhone": "15550000003"}}'}
+]
+
+_PAYLOAD_TEMPLATE = {
+    "temperature": 0.2,  # Lower temperature - consistent results
+    "max_tokens": 512,  # The JSON and one paragraph fit easily
+    "stream": True  # Stream tokens so audio can start before generation finishes
+}
+
+# Try the fast 8B model first (twice), then fall back to the 70B model if its
+# output still cannot be parsed
+GROQ_MODEL_CASCADE = ("llama-3.1-8b-instant", "llama-3.1-8b-instant", "llama3-70b-8192")
+
+def stream_groq_completion(body, on_delta=None):
     """
-    Query the Groq API with user sentences to get housing recommendations
+    Send a streaming chat completion request to Groq and return the full message
+    content, passing each content delta to on_delta as it arrives
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        with _http.stream("POST", GROQ_API_URL, headers=_GROQ_HEADERS, content=body) as response:
+            retry = response.status_code in RETRY_STATUS_CODES and attempt < MAX_RETRIES
+            if not retry:
+                response.raise_for_status()
+                
+                # Server-sent events: one "data: {...}" line per chunk, then "data: [DONE]"
+                parts = []
+                for line in response.iter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[len("data: "):]
+                    if data == "[DONE]":
+                        break
+                    delta = orjson.loads(data)["choices"][0]["delta"].get("content")
+                    if delta:
+                        parts.append(delta)
+                        if on_delta:
+                            on_delta(delta)
+                return "".join(parts)
+        time.sleep(0.2 * (2 ** attempt))
+
+class ExplanationScanner:
+    """
+    Incrementally scan streamed JSON and report the top-level "explanation" string
+    as soon as its closing quote arrives, tracking brace depth and string/escape state
+    """
+    def __init__(self, callback):
+        self.callback = callback
+        self.text = ""
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.awaiting_value = False
+        self.key = None
+        self.done = False
+
+    def feed(self, chunk):
+        start = len(self.text)
+        self.text += chunk
+        if self.done:
+            return
+        
+        for i in range(start, len(self.text)):
+            ch = self.text[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    self._string_closed(i)
+                    if self.done:
+                        return
+            elif ch == '"':
+                self.in_string = True
+                self.string_start = i
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+            elif self.depth == 1 and ch == ":":
+                self.awaiting_value = True
+            elif self.depth == 1 and ch == ",":
+                self.awaiting_value = False
+
+    def _string_closed(self, end):
+        if self.depth != 1:
+            return
+        
+        value = orjson.loads(self.text[self.string_start:end + 1])
+        if not self.awaiting_value:
+            self.key = value
+        elif self.key == "explanation":
+            self.done = True
+            self.callback(value.strip())
+
+# A fenced JSON block followed by the explanation text
+_JSON_FENCE_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```\s*(.*)", re.DOTALL)
+
+def _pop_explanation(parsed_json):
+    """
+    Remove and return the explanation field, treating null or non-string values as empty
+    """
+    explanation = parsed_json.pop("explanation", None)
+    return explanation.strip() if isinstance(explanation, str) else ""
+
+def parse_model_response(model_response):
+    """
+    Split the model output into (recommendation JSON, explanation text), or None if
+    it contains no JSON object
+    """
+    # In JSON mode the whole response is normally one clean object
+    try:
+        parsed_json = orjson.loads(model_response)
+        if isinstance(parsed_json, dict):
+            return parsed_json, _pop_explanation(parsed_json)
+    except orjson.JSONDecodeError:
+        pass
+    
+    # Otherwise look for a fenced code block, then for the outermost braces
+    match = _JSON_FENCE_RE.search(model_response)
+    if match:
+        json_str, trailing_text = match.group(1), match.group(2)
+    else:
+        json_start = model_response.find('{')
+        json_end = model_response.rfind('}') + 1
+        if json_start < 0 or json_end <= json_start:
+            return None
+        json_str, trailing_text = model_response[json_start:json_end], model_response[json_end:]
+    
+    parsed_json = orjson.loads(json_str)
+    if not isinstance(parsed_json, dict):
+        return None
+    return parsed_json, _pop_explanation(parsed_json) or trailing_text.strip()
+
+def query_groq(sentences, on_explanation=None):
+    """
+    Query the Groq API with user sentences to get housing recommendations.
+    on_explanation is called with the explanation text as soon as it has streamed in
     """
     if not GROQ_API_KEY:
         logger.error("GROQ_API_KEY is not set in environment variables")
         return {"error": "API key configuration error"}, 500
     
     try:
-        # Load housing data from database
-        housing_database = load_housing_data()
-        
-        # Prepare the prompt for the Groq model
         user_query = " ".join(sentences)
-        system_prompt = """
-        You are a housing recommendation assistant for college students looking for housing near Stevens Institute of Technology in Hoboken, NJ. 
         
-        Based on the user's query, analyze their preferences and return suitable housing options from our database.
+        # Serve semantically similar queries from the cache without calling Groq
+        query_embedding = embed_query(user_query)
+        if query_embedding is not None:
+            cached_result = lookup_semantic_cache(query_embedding)
+            if cached_result:
+                logger.info(f"Semantic cache hit for query: {user_query}")
+                return cached_result
         
-        First, provide your housing recommendations in valid JSON format ONLY with this structure:
-        {
-            "matches": [list of matching properties with all fields],
-            "recommendation": {
-                "title": "street_address",
-                "images": ["image_urls"],
-                "Cost": "rent as string with $ sign",
-                "Room": "house_type or no_of_bedrooms info",
-                "Lease": "lease_duration",
-                "ownerPhone": "contact_details"
-            }
-        }
+        # Send only the closest houses to the model, or the whole (pre-serialized)
+        # catalog when there is no embedding to rank by
+        if query_embedding is not None:
+            candidates = select_candidate_houses(query_embedding)
+            housing_json = orjson.dumps(prompt_houses(candidates)).decode()
+        else:
+            candidates = load_housing_data()
+            housing_json = load_housing_json()
         
-        Then, AFTER the JSON (not within it), provide a short explanation paragraph about why you made this recommendation, mentioning the proximity to Stevens and any other relevant factors.
-        """
+        # Only the messages vary per request; everything else comes from the template
+        messages = [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            *_FEW_SHOT_MESSAGES,
+            {"role": "user", "content": f"User query: {user_query}\n\nHousing database: {housing_json}"}
+        ]
         
-        # Create the payload for the Groq API
-        payload = {
-            "model": "llama3-70b-8192",  # Using Llama 3 70B model
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"User query: {user_query}\n\nHousing database: {json.dumps(housing_database)}"}
-            ],
-            "temperature": 0.2,  # Lower temperature - consistent results
-            "max_tokens": 2000
-        }
-        
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        logger.info(f"Sending request to Groq API for query: {user_query}")
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload)
-        response.raise_for_status()
-        
-        # Extract the model's response
-        result = response.json()
-        model_response = result["choices"][0]["message"]["content"]
-        
-        # Parse the JSON part from the response
-        try:
-            # Find the JSON part in the response
-            json_start = model_response.find('{')
-            json_end = model_response.rfind('}') + 1
+        for model in GROQ_MODEL_CASCADE:
+            payload = {**_PAYLOAD_TEMPLATE, "model": model, "messages": messages}
             
-            if json_start >= 0 and json_end > json_start:
-                json_str = model_response[json_start:json_end]
-                parsed_json = json.loads(json_str)
-                
-                # Get explanation text after the JSON
-                explanation_text = model_response[json_end:].strip()
-                
-                return {
-                    "recommendation_data": parsed_json,
-                    "explanation_text": explanation_text
-                }
-            else:
-                # If JSON parsing fails, try to find JSON within code blocks
-                if "```json" in model_response:
-                    json_str = model_response.split("```json")[1].split("```")[0].strip()
-                    parsed_json = json.loads(json_str)
-                    
-                    # Get explanation text after the code block
-                    explanation_parts = model_response.split("```")
-                    if len(explanation_parts) > 2:
-                        explanation_text = explanation_parts[2].strip()
-                    else:
-                        explanation_text = ""
-                        
-                    return {
-                        "recommendation_data": parsed_json,
-                        "explanation_text": explanation_text
-                    }
-                elif "```" in model_response:
-                    json_str = model_response.split("```")[1].split("```")[0].strip()
-                    parsed_json = json.loads(json_str)
-                    
-                    # Get explanation text after the code block
-                    explanation_parts = model_response.split("```")
-                    if len(explanation_parts) > 2:
-                        explanation_text = explanation_parts[2].strip()
-                    else:
-                        explanation_text = ""
-                        
-                    return {
-                        "recommendation_data": parsed_json,
-                        "explanation_text": explanation_text
-                    }
-                else:
-                    logger.error(f"Could not find valid JSON in the response")
-                    return {"error": "Failed to parse model response", "raw_response": model_response}, 500
-                
-        except json.JSONDecodeError as e:
-            logger.error(f"Error parsing model response as JSON: {e}")
+            logger.info(f"Sending request to Groq API ({model}) for query: {user_query}")
+            scanner = ExplanationScanner(on_explanation) if on_explanation else None
+            model_response = stream_groq_completion(orjson.dumps(payload), scanner.feed if scanner else None)
+            
+            # Parse the JSON part from the response
+            try:
+                parsed = parse_model_response(model_response)
+            except orjson.JSONDecodeError as e:
+                logger.error(f"Error parsing model response as JSON: {e}")
+                parsed = None
+            
+            if parsed is not None:
+                break
+            logger.error(f"Could not find valid JSON in the response from {model}")
             logger.error(f"Raw response: {model_response}")
+        else:
             return {"error": "Failed to parse model response", "raw_response": model_response}, 500
+        
+        parsed_json, explanation_text = parsed
+        result = {
+            "recommendation_data": attach_house_details(parsed_json, candidates),
+            "explanation_text": explanation_text
+        }
+        if query_embedding is not None:
+            store_semantic_cache(query_embedding, result)
+        return result
             
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error making request to Groq API: {e}")
         return {"error": f"Error communicating with language model API: {str(e)}"}, 500
     except Exception as e:
         logger.error(f"Unexpected error in query_groq: {e}")
         return {"error": f"Unexpected error: {str(e)}"}, 500
 
-def generate_audio(text):
+# Synthesized clips keyed by their content-addressed filename, for the hottest repeats
+_audio_cache = LRUCache(maxsize=256)
+_audio_cache_lock = threading.Lock()
+
+def clean_audio_text(text):
+    """
+    Clean and truncate text the way it is sent for audio synthesis
+    """
+    # Basic text cleaning for audio synthesis
+    clean_text = text.replace("\n", " ").strip()
+    
+    # Limit text length for audio generation
+    if len(clean_text) > 5000:
+        clean_text = clean_text[:5000] + "..."
+    return clean_text
+
+def audio_filename_for(text):
+    """
+    Content-addressed filename for the audio of a given text, so identical
+    explanations map to the same clip
+    """
+    key = hashlib.blake2b(clean_audio_text(text).encode(), digest_size=16).hexdigest()
+    return f"{key}.mp3"
+
+def remember_audio(audio_filename, audio_base64, stored=True):
     """
-    Generate audio from text using ElevenLabs API
+    Keep a synthesized clip in the in-process audio cache. stored says whether it
+    is on disk: True, False, or the future of its background write
     """
+    with _audio_cache_lock:
+        _audio_cache[audio_filename] = (audio_base64, stored)
+
+def generate_audio(text, inline=True):
+    """
+    Generate audio from text using ElevenLabs API, reusing a previously synthesized
+    clip for the same text. With inline=False the clip is only saved and returned
+    by location, without a base64 copy
+    """
+    clean_text = clean_audio_text(text)
+    audio_filename = audio_filename_for(text)
+    audio_path = audio_location(audio_filename)
+    
+    # Hot path: this exact text was synthesized recently by this process
+    with _audio_cache_lock:
+        cached = _audio_cache.get(audio_filename)
+    if cached is not None:
+        cached_base64, stored = cached
+        if isinstance(stored, Future):
+            # A client fetching by URL waits for the write to land; one getting the
+            # base64 does not wait on a write still in flight
+            stored = True if inline and not stored.done() else stored.result()
+        return {
+            "audio_base64": cached_base64 if inline or not stored else None,
+            "audio_path": audio_path if stored else None
+        }
+    
+    # Already synthesized by an earlier request and saved to disk
+    if os.path.exists(audio_path):
+        try:
+            audio_base64 = None
+            if inline:
+                with open(audio_path, "rb") as f:
+                    audio_base64 = base64.b64encode(f.read()).decode('ascii')
+                remember_audio(audio_filename, audio_base64)
+            return {"audio_base64": audio_base64, "audio_path": audio_path}
+        except OSError as e:
+            logger.error(f"Error reading cached audio file {audio_path}: {e}")
+
     if not ELEVENLABS_API_KEY:
         logger.error("ELEVENLABS_API_KEY is not set in environment variables")
         return None
     
     try:
-        # Basic text cleaning for audio synthesis
-        clean_text = text.replace("\n", " ").strip()
-        
-        # Limit text length for audio generation
-        if len(clean_text) > 5000:
-            clean_text = clean_text[:5000] + "..."
-        
         headers = {
             "xi-api-key": ELEVENLABS_API_KEY,
             "Content-Type": "application/json"
@@ -221,74 +872,276 @@ def generate_audio(text):
         }
         
         logger.info("Sending request to ElevenLabs API")
-        response = requests.post(
+        response = post_with_retry(
             f"{ELEVENLABS_API_URL}/{voice_id}",
             headers=headers,
-            json=payload
+            content=orjson.dumps(payload)
         )
         response.raise_for_status()
         
-        # Save audio file locally
-        timestamp = int(time.time())
-        audio_filename = f"audio_{timestamp}.mp3"
-        audio_path = os.path.join("audio_files", audio_filename)
-        
-        # Ensure directory exists
-        os.makedirs("audio_files", exist_ok=True)
-        
-        with open(audio_path, "wb") as f:
-            f.write(response.content)
+        # Save audio file locally: in the background when the client gets the base64
+        # anyway, otherwise before returning the path it will be served from
+        if inline:
+            stored = _io_pool.submit(write_audio_file, audio_path, response.content)
+        else:
+            stored = write_audio_file(audio_path, response.content)
         
-        # Return audio content as base64 and the file path
-        audio_base64 = base64.b64encode(response.content).decode('utf-8')
+        # Return audio content as base64 (unless the client will fetch it) and the file
+        # path; if the write failed the clip is sent inline after all
+        audio_base64 = None
+        if inline or not stored:
+            audio_base64 = base64.b64encode(response.content).decode('ascii')
+            remember_audio(audio_filename, audio_base64, stored)
+        if stored is False:
+            audio_path = None
         return {
             "audio_base64": audio_base64,
             "audio_path": audio_path
         }
         
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error making request to ElevenLabs API: {e}")
         return None
     except Exception as e:
         logger.error(f"Unexpected error in generate_audio: {e}")
         return None
 
-def store_response_in_db(user_query, recommendation_data, explanation_text, audio_path=None):
+def write_audio_file(audio_path, content):
     """
-    Store the response in the Supabase database
+    Write a generated audio clip to disk, returning whether it succeeded
     """
     try:
-        response_data = {
-            "user_query": user_query,
-            "recommendation_data": recommendation_data,
-            "explanation_text": explanation_text,
-            "audio_path": audio_path,
-            "created_at": str(time.time())
-        }
-        
-        result = supabase.table('responses').insert(response_data).execute()
-        logger.info(f"Stored response in database with ID: {result.data[0]['id'] if result.data else 'unknown'}")
-        return result.data[0]['id'] if result.data else None
+        # Write to a temporary file and rename it into place, so a concurrent
+        # request never reads a half-written clip
+        tmp_path = f"{audio_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, audio_path)
+        return True
     except Exception as e:
-        logger.error(f"Error storing response in database: {e}")
+        logger.error(f"Error saving audio file {audio_path}: {e}")
+        return False
+
+def audio_location(audio_filename):
+    """
+    Return the local path an audio clip is (or will be) saved to
+    """
+    return os.path.join(AUDIO_DIR, audio_filename)
+
+def audio_url_for(audio_path):
+    """
+    Return the URL the serve_audio route serves a saved clip from
+    """
+    if not audio_path:
         return None
+    return url_for('serve_audio', filename=os.path.basename(audio_path), _external=True)
+
+# Responses are written behind the request: queued here and inserted in batches
+RESPONSE_BATCH_SIZE = 32
+RESPONSE_BATCH_INTERVAL = 0.5
+_response_queue = queue.Queue()
+_response_writer_stop = threading.Event()
+
+def store_response_in_db(user_query, recommendation_json, explanation_text, audio_path=None):
+    """
+    Queue the response for insertion into the Supabase database and return its ID.
+    recommendation_json is the recommendation already encoded as JSON bytes
+    """
+    # The ID is generated here so the client gets it without waiting for the insert
+    response_id = str(uuid.uuid4())
+    _response_queue.put({
+        "id": response_id,
+        "user_query": user_query,
+        "recommendation_data": recommendation_json,
+        "explanation_text": explanation_text,
+        "audio_path": audio_path,
+        "created_at": str(time.time())
+    })
+    return response_id
+
+def write_responses(batch):
+    """
+    Insert a batch of queued responses, retrying once and then falling back to one
+    insert per row so a single bad row does not lose the rest of the batch
+    """
+    if insert_responses(batch) or insert_responses(batch):
+        return
+    if len(batch) > 1:
+        logger.warning(f"Inserting {len(batch)} responses one at a time")
+        for row in batch:
+            insert_responses([row])
+
+def insert_responses(batch):
+    """
+    Insert a batch of queued responses with a single request, returning whether it succeeded
+    """
+    if _pool is not None:
+        try:
+            columns = ", ".join(batch[0])
+            values = ", ".join(
+                f"%({column})s::jsonb" if column == "recommendation_data" else f"%({column})s"
+                for column in batch[0]
+            )
+            rows = [{**row, "recommendation_data": row["recommendation_data"].decode()} for row in batch]
+            with _pool.connection() as conn, conn.cursor() as cur:
+                cur.executemany(f"insert into responses ({columns}) values ({values})", rows)
+            logger.info(f"Stored {len(batch)} responses in database")
+            return True
+        except Exception as e:
+            logger.error(f"Error storing responses through the pooler: {e}")
+
+    # Post the rows directly so the pre-encoded recommendations are embedded as-is
+    # instead of being decoded and re-encoded by the client
+    try:
+        body = orjson.dumps([
+            {**row, "recommendation_data": orjson.Fragment(row["recommendation_data"])}
+            for row in batch
+        ])
+        postgrest = supabase.postgrest
+        response = postgrest.session.post(
+            str(postgrest.base_url.joinpath("responses")),
+            content=body,
+            headers={**postgrest.headers, "Content-Type": "application/json", "Prefer": "return=minimal"}
+        )
+        response.raise_for_status()
+        logger.info(f"Stored {len(batch)} responses in database")
+        return True
+    except Exception as e:
+        logger.error(f"Error posting responses to PostgREST: {e}")
+
+    # The direct post relies on the client's session internals; fall back to the
+    # public insert API, which re-encodes the rows itself
+    try:
+        rows = [{**row, "recommendation_data": orjson.loads(row["recommendation_data"])} for row in batch]
+        supabase.table('responses').insert(rows).execute()
+        logger.info(f"Stored {len(batch)} responses in database")
+        return True
+    except Exception as e:
+        logger.error(f"Error storing responses in database: {e}")
+        return False
 
-@app.route('/recommend', methods=['POST'])
+def _response_writer_loop():
+    """
+    Collect queued responses for up to RESPONSE_BATCH_INTERVAL seconds (or
+    RESPONSE_BATCH_SIZE items) and insert them together
+    """
+    while not _response_writer_stop.is_set():
+        try:
+            batch = [_response_queue.get(timeout=RESPONSE_BATCH_INTERVAL)]
+        except queue.Empty:
+            continue
+        deadline = time.time() + RESPONSE_BATCH_INTERVAL
+        while len(batch) < RESPONSE_BATCH_SIZE:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_response_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        write_responses(batch)
+
+@atexit.register
+def flush_response_queue():
+    """
+    Insert anything still queued when the process shuts down, after waiting for
+    the batch the writer is inserting
+    """
+    # Let the writer finish its current batch first; it stops before taking another
+    _response_writer_stop.set()
+    _response_writer.join()
+    
+    batch = []
+    while True:
+        try:
+            batch.append(_response_queue.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        write_responses(batch)
+
+_response_writer = threading.Thread(target=_response_writer_loop, name="response-writer", daemon=True)
+_response_writer.start()
+
+# GET /recommend responses may be cached by browsers and any CDN in front of the API
+RECOMMEND_CACHE_CONTROL = "public, max-age=300, s-maxage=3600, stale-while-revalidate=86400"
+
+def response_etag(cache_entry, inline_audio):
+    """
+    ETag for a GET /recommend response, derived from the response cache entry it is
+    served from, so a new answer for the same query gets a new tag
+    """
+    digest = hashlib.blake2b(orjson.dumps(cache_entry, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+    return f"{digest}-{'inline' if inline_audio else 'url'}"
+
+def add_http_cache_headers(response, etag, complete=True):
+    """
+    Mark a GET /recommend response as cacheable, tagged with the query's ETag.
+    Like the response cache, only complete responses qualify: one without audio
+    is marked no-store so a transient TTS failure is not replayed
+    """
+    if not complete:
+        response.headers["Cache-Control"] = "no-store"
+        return response
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = RECOMMEND_CACHE_CONTROL
+    return response
+
+@app.route('/recommend', methods=['GET', 'POST'])
 def recommend_housing():
     """
-    API endpoint to recommend housing based on input sentences
+    API endpoint to recommend housing based on input sentences. POST takes a JSON
+    body with "sentences"; GET takes the query as ?q=... so it can be cached
     """
     try:
-        data = request.json
-        sentences = data.get('sentences', [])
+        if request.method == 'GET':
+            query = request.args.get('q', '').strip()
+            sentences = [query] if query else []
+            inline_audio = request.args.get('inline_audio', 'true').lower() != 'false'
+        else:
+            data = request.json
+            sentences = data.get('sentences', [])
+            
+            # Clients that play audio from audio_url can skip the base64 copy in the response
+            inline_audio = data.get('inline_audio', True)
         
         if not sentences:
             return jsonify({"error": "No input sentences provided"}), 400
         
         user_query = " ".join(sentences)
+        query_hash = response_cache_key(user_query)
+        
+        # Return the stored response directly if this exact query was answered before
+        cached_response = lookup_response_cache(query_hash)
+        if cached_response is not None:
+            logger.info(f"Response cache hit for query: {user_query}")
+            
+            # A client or CDN still holding this exact answer can revalidate without
+            # the audio being rebuilt
+            etag = response_etag(cached_response, inline_audio) if request.method == 'GET' else None
+            if etag and request.if_none_match.contains_weak(etag):
+                return add_http_cache_headers(app.response_class(status=304), etag)
+            
+            audio_result = generate_audio(cached_response["explanation_text"], inline_audio)
+            response = jsonify({
+                **cached_response,
+                "audio_response": audio_result.get("audio_base64") if audio_result else None,
+                "audio_url": audio_url_for(audio_result.get("audio_path")) if audio_result else None
+            })
+            return add_http_cache_headers(response, etag, bool(audio_result)) if etag else response
+        
+        # Query the Groq API for recommendations, starting text-to-speech as soon
+        # as the explanation has streamed in rather than after the whole response
+        early_audio = {}
+        def start_audio(text):
+            # Each cascade attempt streams its own explanation; only the first one
+            # starts a synthesis, and it is reused below only if the text matches
+            if "future" in early_audio:
+                return
+            early_audio["text"] = text
+            early_audio["future"] = _executor.submit(generate_audio, text, inline_audio)
         
-        # Query the Groq API for recommendations
-        recommendation_result = query_groq(sentences)
+        recommendation_result = query_groq(sentences, on_explanation=start_audio)
         
         # Check if there was an error
         if isinstance(recommendation_result, tuple) and len(recommendation_result) == 2 and isinstance(recommendation_result[0], dict) and "error" in recommendation_result[0]:
@@ -297,27 +1150,48 @@ def recommend_housing():
         recommendation_data = recommendation_result.get("recommendation_data", {})
         explanation_text = recommendation_result.get("explanation_text", "")
         
-        # Generate audio ONLY for the explanation text
-        audio_result = generate_audio(explanation_text)
+        # Encode the recommendation once; the database write and the response body both reuse it
+        recommendation_json = orjson.dumps(recommendation_data)
         
-        # Store the response in the database
+        # Generate audio ONLY for the explanation text, reusing the job started
+        # during streaming unless the final text differs
+        if early_audio.get("text") == explanation_text:
+            audio_result = early_audio["future"].result()
+        else:
+            audio_result = generate_audio(explanation_text, inline_audio)
         audio_path = audio_result.get("audio_path") if audio_result else None
-        response_id = store_response_in_db(user_query, recommendation_data, explanation_text, audio_path)
+        
+        # Store the response in the database (queued, so this does not wait on Supabase)
+        response_id = store_response_in_db(user_query, recommendation_json, explanation_text, audio_path)
         
         # Prepare the final response
         response = {
             "text_response": recommendation_data,
             "explanation_text": explanation_text,
             "audio_response": audio_result.get("audio_base64") if audio_result else None,
+            "audio_url": audio_url_for(audio_path),
             "response_id": response_id
         }
         
-        return jsonify(response)
+        # Only cache complete responses so a transient TTS failure is not replayed
+        if audio_result:
+            store_response_cache(query_hash, response)
+        etag = response_etag(response_cache_entry(response), inline_audio) if request.method == 'GET' else None
+        
+        response = jsonify({**response, "text_response": orjson.Fragment(recommendation_json)})
+        return add_http_cache_headers(response, etag, bool(audio_result)) if etag else response
         
     except Exception as e:
         logger.error(f"Error in recommend_housing endpoint: {e}")
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+@app.route('/audio/<path:filename>', methods=['GET'])
+def serve_audio(filename):
+    """
+    Serve a generated audio clip from the local audio directory
+    """
+    return send_from_directory(AUDIO_DIR, filename, mimetype="audio/mpeg")
+
 # # Dummy housing data for Stevens Institute of Technology area
 # DUMMY_HOUSING_DATA = [
 #     {
@@ -474,7 +1348,11 @@ def recommend_housing():
 #     }
 # ]
 
-if __name__ == "__main__":
+def run_startup_checks():
+    """
+    Warn about missing configuration and initialize the database. Runs once at
+    startup: from __main__, or from the gunicorn post_worker_init hook
+    """
     # Check if API keys are set
     if not GROQ_API_KEY:
         logger.warning("GROQ_API_KEY is not set. The API will not work properly.")
@@ -485,6 +1363,9 @@ if __name__ == "__main__":
     else:
         # Initialize database with sample data
         initialize_database()
-        
+
+if __name__ == "__main__":
+    run_startup_checks()
+    
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,43 @@
+# Gunicorn settings for the housing recommendation API
+# Run with: gunicorn -c gunicorn.conf.py app:app (or app_local:app)
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Requests spend almost all their time waiting on external APIs, so use
+# gevent workers that each multiplex many connections
+worker_class = "gevent"
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", 1000))
+timeout = 60
+
+def on_starting(server):
+    """
+    Name a marker file for this master process, inherited by the workers it forks
+    """
+    import tempfile
+
+    os.environ["DUCKNEST_STARTUP_MARKER"] = os.path.join(
+        tempfile.gettempdir(), f"ducknest-startup-{os.getpid()}"
+    )
+
+def post_worker_init(worker):
+    """
+    Run the app's startup checks and database initialization under gunicorn,
+    where the module's __main__ block never runs. This happens once per master:
+    the first worker to take the lock runs them and leaves the marker file, and
+    workers booting alongside it or restarted later skip
+    """
+    import fcntl
+    import sys
+
+    marker = os.environ["DUCKNEST_STARTUP_MARKER"]
+    with open(f"{marker}.lock", "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        if os.path.exists(marker):
+            return
+        sys.modules[worker.wsgi.import_name].run_startup_checks()
+        open(marker, "w").close()
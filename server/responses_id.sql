@@ -0,0 +1,6 @@
+-- Required by the batched response writer: response IDs are generated by the server
+-- (uuid4 strings) so /recommend can return them before the insert happens.
+-- Run once in the Supabase SQL editor. Existing numeric IDs are kept as text.
+alter table responses alter column id drop identity if exists;
+alter table responses alter column id drop default;
+alter table responses alter column id type text using id::text;
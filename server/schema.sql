@@ -0,0 +1,79 @@
+-- Supabase schema used by the server, on top of the existing houses and responses tables.
+-- Run once in the Supabase SQL editor. Every statement is safe to re-run.
+
+create extension if not exists vector;
+
+-- Semantic cache of Groq results (all-MiniLM-L6-v2 embeddings are 384-dimensional)
+create table if not exists groq_cache (
+    id bigint generated by default as identity primary key,
+    embedding vector(384) not null,
+    recommendation_data jsonb not null,
+    explanation_text text,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists groq_cache_embedding_idx
+    on groq_cache using ivfflat (embedding vector_cosine_ops) with (lists = 100);
+
+create index if not exists groq_cache_created_at_idx on groq_cache (created_at);
+
+-- Rows older than max_age_seconds are ignored, so answers about houses that are no
+-- longer listed expire. created_at is returned as Unix time for the in-process cache
+drop function if exists match_cache(vector, float, int);
+create or replace function match_cache(
+    query_embedding vector(384),
+    match_threshold float,
+    match_count int,
+    max_age_seconds int default 86400
+)
+returns table (recommendation_data jsonb, explanation_text text, similarity float, created_at float)
+language sql stable
+as $$
+    select recommendation_data, explanation_text,
+           1 - (embedding <=> query_embedding) as similarity,
+           extract(epoch from groq_cache.created_at)::float as created_at
+    from groq_cache
+    where 1 - (embedding <=> query_embedding) >= match_threshold
+      and groq_cache.created_at > now() - make_interval(secs => max_age_seconds)
+    order by embedding <=> query_embedding
+    limit match_count;
+$$;
+
+-- Exact-match cache of /recommend responses, keyed by the sha256 of the normalized query.
+-- created_at holds the Unix time as text, like responses.created_at
+create table if not exists responses_cache (
+    query_hash text primary key,
+    response jsonb not null,
+    created_at text not null
+);
+
+-- House embeddings and nearest-neighbour lookup for prompt candidates. Houses listed
+-- since the last embedding backfill are returned too (up to match_count of them), so
+-- new listings reach the prompt straight away and the server knows to embed them
+alter table houses add column if not exists embedding vector(384);
+
+create index if not exists houses_embedding_idx
+    on houses using hnsw (embedding vector_cosine_ops);
+
+create or replace function match_houses(
+    query_embedding vector(384),
+    match_count int
+)
+returns setof houses
+language sql stable
+as $$
+    (
+        select *
+        from houses
+        where embedding is not null
+        order by embedding <=> query_embedding
+        limit match_count
+    )
+    union all
+    (
+        select *
+        from houses
+        where embedding is null
+        limit match_count
+    );
+$$;
@@ -0,0 +1,149 @@
+"""
+Tests for streaming and parsing the Groq model output.
+Run from the server directory with: python -m unittest discover tests
+"""
+import contextlib
+import unittest
+from unittest import mock
+
+import orjson
+
+import app
+
+
+def scan(chunks):
+    """
+    Feed chunks to an ExplanationScanner and return every explanation it reported
+    """
+    reported = []
+    scanner = app.ExplanationScanner(reported.append)
+    for chunk in chunks:
+        scanner.feed(chunk)
+    return reported
+
+
+def split(text, size):
+    """
+    Split text into chunks of the given size, like a token stream would
+    """
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class ExplanationScannerTest(unittest.TestCase):
+    def test_reports_explanation_across_any_chunking(self):
+        text = '{"explanation": " Close to campus. ", "matches": ["h001"]}'
+        for size in (1, 2, 3, 7, len(text)):
+            self.assertEqual(scan(split(text, size)), ["Close to campus."])
+
+    def test_handles_escaped_quotes_and_backslashes(self):
+        text = r'{"explanation": "A \"quiet\" street, C:\\ drive {not json}", "matches": []}'
+        for size in (1, 5):
+            self.assertEqual(scan(split(text, size)), ['A "quiet" street, C:\\ drive {not json}'])
+
+    def test_ignores_explanation_as_a_value(self):
+        text = '{"note": "explanation", "explanation": "The real one."}'
+        self.assertEqual(scan([text]), ["The real one."])
+
+    def test_ignores_nested_explanation_key(self):
+        text = '{"recommendation": {"explanation": "nested"}, "matches": [{"explanation": "x"}], "explanation": "top"}'
+        self.assertEqual(scan(split(text, 4)), ["top"])
+
+    def test_null_explanation_is_not_reported(self):
+        text = '{"explanation": null, "matches": ["h001"], "recommendation": {"title": "215 River St"}}'
+        self.assertEqual(scan(split(text, 3)), [])
+
+    def test_reports_only_once(self):
+        text = '{"explanation": "first", "explanation": "second"}'
+        self.assertEqual(scan([text]), ["first"])
+
+    def test_fenced_output(self):
+        text = '```json\n{"explanation": "Fenced.", "matches": []}\n```'
+        self.assertEqual(scan(split(text, 6)), ["Fenced."])
+
+
+class ParseModelResponseTest(unittest.TestCase):
+    def test_plain_object(self):
+        parsed = app.parse_model_response('{"explanation": " Good fit. ", "matches": ["h001"]}')
+        self.assertEqual(parsed, ({"matches": ["h001"]}, "Good fit."))
+
+    def test_null_or_non_string_explanation_is_empty(self):
+        self.assertEqual(app.parse_model_response('{"explanation": null, "matches": []}'), ({"matches": []}, ""))
+        self.assertEqual(app.parse_model_response('{"explanation": 5, "matches": []}'), ({"matches": []}, ""))
+
+    def test_fenced_block_with_trailing_text(self):
+        response = 'Here you go:\n```json\n{"matches": ["h002"]}\n```\nIt is the closest to Stevens.'
+        self.assertEqual(app.parse_model_response(response), ({"matches": ["h002"]}, "It is the closest to Stevens."))
+
+    def test_fenced_block_explanation_wins_over_trailing_text(self):
+        response = '```\n{"explanation": "Inside.", "matches": []}\n```\nOutside.'
+        self.assertEqual(app.parse_model_response(response), ({"matches": []}, "Inside."))
+
+    def test_outer_braces_with_surrounding_text(self):
+        response = 'Sure! {"matches": ["h003"], "recommendation": {"title": "420 Hudson St"}} Enjoy.'
+        self.assertEqual(
+            app.parse_model_response(response),
+            ({"matches": ["h003"], "recommendation": {"title": "420 Hudson St"}}, "Enjoy.")
+        )
+
+    def test_no_json(self):
+        self.assertIsNone(app.parse_model_response("I could not find anything."))
+
+    def test_invalid_json_raises(self):
+        with self.assertRaises(orjson.JSONDecodeError):
+            app.parse_model_response('{"matches": [}')
+
+
+class FakeStreamResponse:
+    def __init__(self, status_code, lines=()):
+        self.status_code = status_code
+        self.lines = lines
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise app.httpx.HTTPStatusError("error", request=None, response=None)
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+
+def sse(*deltas):
+    lines = [": keep-alive", ""]
+    for delta in deltas:
+        lines.append("data: " + orjson.dumps({"choices": [{"delta": {"content": delta}}]}).decode())
+    lines.append("data: " + orjson.dumps({"choices": [{"delta": {}}]}).decode())
+    lines.append("data: [DONE]")
+    lines.append("data: " + orjson.dumps({"choices": [{"delta": {"content": "after done"}}]}).decode())
+    return lines
+
+
+class StreamGroqCompletionTest(unittest.TestCase):
+    def fake_stream(self, *responses):
+        responses = list(responses)
+
+        @contextlib.contextmanager
+        def stream(method, url, **kwargs):
+            yield responses.pop(0)
+        return stream
+
+    def test_joins_deltas_and_reports_each_one(self):
+        deltas = []
+        stream = self.fake_stream(FakeStreamResponse(200, sse('{"explanation": "Hi', '."}')))
+        with mock.patch.object(app._http, "stream", stream):
+            content = app.stream_groq_completion(b"{}", deltas.append)
+        self.assertEqual(content, '{"explanation": "Hi."}')
+        self.assertEqual(deltas, ['{"explanation": "Hi', '."}'])
+
+    def test_retries_retryable_status(self):
+        stream = self.fake_stream(FakeStreamResponse(503), FakeStreamResponse(200, sse("ok")))
+        with mock.patch.object(app._http, "stream", stream), mock.patch.object(app.time, "sleep"):
+            self.assertEqual(app.stream_groq_completion(b"{}"), "ok")
+
+    def test_raises_on_other_errors(self):
+        stream = self.fake_stream(FakeStreamResponse(400))
+        with mock.patch.object(app._http, "stream", stream):
+            with self.assertRaises(app.httpx.HTTPStatusError):
+                app.stream_groq_completion(b"{}")
+
+
+if __name__ == "__main__":
+    unittest.main()